@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# cython: language_level=3, boundscheck=False, wraparound=False, initializedcheck=False, cdivision=True
+"""
+Ahead-of-time compiled access kernels for path_oram_sim_py38.py (optional).
+Same algorithm and array layout as the numba kernels there, but with no JIT warmup.
+Build it in place next to the simulator with:
+CFLAGS="-O3 -march=native" cythonize -i path_oram_core.pyx
+"""
+
+from libc.stdlib cimport calloc, free, malloc
+
+# slots of the stash_meta array, must match path_oram_sim_py38.py
+cdef enum:
+    FREE_HEAD = 0
+    STASH_COUNT = 1
+
+# stores (bid, data) in the free stash slot at the head of the free-list
+cdef inline void stash_insert(int[::1] stash_bids, long long[::1] stash_data, unsigned char[::1] stash_used,
+                              int[::1] stash_next, int[::1] stash_slot, long long[::1] stash_meta,
+                              int bid, long long data) noexcept nogil:
+    cdef long long slot = stash_meta[FREE_HEAD]
+    stash_meta[FREE_HEAD] = stash_next[slot]
+    stash_bids[slot] = bid
+    stash_data[slot] = data
+    stash_used[slot] = 1
+    stash_slot[bid] = <int>slot
+    stash_meta[STASH_COUNT] += 1
+
+# frees stash slot 'slot' (pushing it back on the free-list) and returns the data it held
+cdef inline long long stash_remove(int[::1] stash_bids, long long[::1] stash_data, unsigned char[::1] stash_used,
+                                   int[::1] stash_next, int[::1] stash_slot, long long[::1] stash_meta,
+                                   int slot) noexcept nogil:
+    stash_slot[stash_bids[slot]] = -1
+    stash_bids[slot] = -1
+    stash_used[slot] = 0
+    stash_next[slot] = <int>stash_meta[FREE_HEAD]
+    stash_meta[FREE_HEAD] = slot
+    stash_meta[STASH_COUNT] -= 1
+    return stash_data[slot]
+
+# moves every block stored on the path to leaf x into the stash
+cdef void read_path(int[::1] tree_bids, long long[::1] tree_data, unsigned char[::1] tree_occ, int Z, int L,
+                    int[:, ::1] path_table, long long x, int[::1] stash_bids, long long[::1] stash_data,
+                    unsigned char[::1] stash_used, int[::1] stash_next, int[::1] stash_slot,
+                    long long[::1] stash_meta) noexcept nogil:
+    cdef int l, k, flat
+    for l in range(L + 1):
+        flat = path_table[x, l]
+        for k in range(flat * Z, flat * Z + tree_occ[flat]):
+            stash_insert(stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta,
+                         tree_bids[k], tree_data[k])
+        tree_occ[flat] = 0
+
+# reads the data of block a; every block is always in the tree or the stash, so once read_path has read
+# the path to position[a] the block is in the stash
+cdef inline long long stash_read(int a, long long[::1] stash_data, int[::1] stash_slot) noexcept nogil:
+    return stash_data[stash_slot[a]]
+
+# replaces the data of block a (in the stash, see stash_read) with new_data and returns the data it held
+cdef inline long long stash_write(int a, long long new_data, long long[::1] stash_data,
+                                  int[::1] stash_slot) noexcept nogil:
+    cdef int slot_a = stash_slot[a]
+    cdef long long old_data = stash_data[slot_a]
+    stash_data[slot_a] = new_data
+    return old_data
+
+# level-major deepest-fit eviction of the path to leaf x, which read_path has just emptied (see partition_stash
+# and refill_level in path_oram_sim_py38.py)
+cdef void evict_path(int[::1] tree_bids, long long[::1] tree_data, unsigned char[::1] tree_occ, int Z, int L,
+                     signed char[::1] shared_level, int[::1] position, long long x, int[::1] stash_bids,
+                     long long[::1] stash_data, unsigned char[::1] stash_used, int[::1] stash_next,
+                     int[::1] stash_slot, long long[::1] stash_meta) noexcept nogil:
+    cdef int l, d, flat, occ
+    cdef long long remaining = (L + 1) * Z # free slots left on the path
+    cdef Py_ssize_t j, s, n = stash_meta[STASH_COUNT], npend = 0, keep
+    if n == 0:
+        return
+
+    # counting sort of the stash slots by the deepest level their block fits at
+    cdef long long* order = <long long*>malloc(n * sizeof(long long))
+    cdef long long* slots = <long long*>malloc(n * sizeof(long long))
+    cdef signed char* deepest = <signed char*>malloc(n * sizeof(signed char))
+    cdef long long* level_end = <long long*>calloc(L + 2, sizeof(long long))
+    cdef long long* fill = <long long*>malloc((L + 1) * sizeof(long long))
+    j = 0
+    for s in range(stash_bids.shape[0]):
+        if stash_used[s]:
+            d = shared_level[position[stash_bids[s]] ^ x]
+            slots[j] = s
+            deepest[j] = d
+            level_end[d] += 1
+            j += 1
+    for l in range(L - 1, -1, -1):
+        level_end[l] += level_end[l + 1]
+    for l in range(L + 1): # the group of level d goes to order[level_end[d + 1]:level_end[d]]
+        fill[l] = level_end[l + 1]
+    for j in range(n):
+        order[fill[deepest[j]]] = slots[j]
+        fill[deepest[j]] += 1
+
+    for l in range(L, -1, -1):
+        if remaining == 0 or stash_meta[STASH_COUNT] == 0:
+            break # nothing left to place, or nowhere left to place it
+        for j in range(level_end[l + 1], level_end[l]):
+            order[npend] = order[j]
+            npend += 1
+        keep = 0
+        for j in range(npend):
+            s = order[j]
+            flat = (1 << l) - 1 + (position[stash_bids[s]] >> (L - l))
+            occ = tree_occ[flat]
+            if occ < Z:
+                tree_bids[flat * Z + occ] = stash_bids[s]
+                tree_data[flat * Z + occ] = stash_remove(stash_bids, stash_data, stash_used, stash_next, stash_slot,
+                                                         stash_meta, s)
+                tree_occ[flat] = occ + 1
+                remaining -= 1
+            else:
+                order[keep] = s
+                keep += 1
+        npend = keep
+
+    free(order)
+    free(slots)
+    free(deepest)
+    free(level_end)
+    free(fill)
+
+# read-path eviction read of block a on leaf x; position[a] must already hold the new leaf
+# the stash needs at least (L+1)*Z + 1 free slots on entry
+cpdef long long access_read(int[::1] tree_bids, long long[::1] tree_data, unsigned char[::1] tree_occ, int Z, int L,
+                            int[:, ::1] path_table, signed char[::1] shared_level, int[::1] position, int a,
+                            long long x, int[::1] stash_bids, long long[::1] stash_data,
+                            unsigned char[::1] stash_used, int[::1] stash_next, int[::1] stash_slot,
+                            long long[::1] stash_meta) noexcept nogil:
+    cdef long long old_data
+    read_path(tree_bids, tree_data, tree_occ, Z, L, path_table, x,
+              stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+    old_data = stash_read(a, stash_data, stash_slot)
+    evict_path(tree_bids, tree_data, tree_occ, Z, L, shared_level, position, x,
+               stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+    return old_data
+
+# same as access_read, but writes new_data to block a
+cpdef long long access_write(int[::1] tree_bids, long long[::1] tree_data, unsigned char[::1] tree_occ, int Z, int L,
+                             int[:, ::1] path_table, signed char[::1] shared_level, int[::1] position, int a,
+                             long long x, long long new_data, int[::1] stash_bids, long long[::1] stash_data,
+                             unsigned char[::1] stash_used, int[::1] stash_next, int[::1] stash_slot,
+                             long long[::1] stash_meta) noexcept nogil:
+    cdef long long old_data
+    read_path(tree_bids, tree_data, tree_occ, Z, L, path_table, x,
+              stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+    old_data = stash_write(a, new_data, stash_data, stash_slot)
+    evict_path(tree_bids, tree_data, tree_occ, Z, L, shared_level, position, x,
+               stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+    return old_data
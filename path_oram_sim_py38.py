@@ -9,158 +9,398 @@ python3 path_oram_sim_py38.py --N 65536 --Z 2 --L 16 --ops 5000000 --warmup 3000
 
 import argparse
 import math
-import random
+import os
 import sys
-from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from typing import Optional
 
-# converts (level,index) into an array index in the flat representation of tree
-def node_index(level: int, idx: int) -> int:
-    return (1 << level) - 1 + idx
+import numpy as np
 
-# returns a list of nodes from root to leaf_x (not the buckets of those nodes!)
-def path_nodes(L: int, leaf_x: int):
-    nodes = []
-    for l in range(0, L + 1):
-        idx = leaf_x >> (L - l) if l > 0 else 0
-        nodes.append((l, idx))
-    return nodes
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the kernels below then run as plain Python
 
-# checks if 2 leaves have the same ancestor at requested level 'level'
-def same_subtree_at_level(L: int, leaf_a: int, leaf_b: int, level: int) -> bool:
-    if level == 0:
-        return True
-    return (leaf_a >> (L - level)) == (leaf_b >> (L - level))
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
 
+try:
+    import path_oram_core  # optional ahead-of-time build of the same kernels, see path_oram_core.pyx
+except ImportError:
+    path_oram_core = None
+
+# slots of the stash_meta array shared by the stash kernels
+FREE_HEAD = 0    # first free stash slot (-1 when the stash arrays are full)
+STASH_COUNT = 1  # number of blocks currently in the stash
+
+# block data is one int64: the block id in the high bits and its version (number of writes so far)
+# in the low VERSION_BITS, i.e. data >> VERSION_BITS is the id and data & VERSION_MASK the version
+VERSION_BITS = 32
+VERSION_MASK = (1 << VERSION_BITS) - 1
+
+# splits block data (a single value or an array) into (block id, version)
+def unpack_data(data):
+    return data >> VERSION_BITS, data & VERSION_MASK
+
+# stores (bid, data) in the free stash slot at the head of the free-list and returns that slot
+@njit(cache=True)
+def stash_insert(stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta, bid, data):
+    slot = stash_meta[FREE_HEAD]
+    stash_meta[FREE_HEAD] = stash_next[slot]
+    stash_bids[slot] = bid
+    stash_data[slot] = data
+    stash_used[slot] = 1
+    stash_slot[bid] = slot
+    stash_meta[STASH_COUNT] += 1
+    return slot
+
+# frees stash slot 'slot' (pushing it back on the free-list) and returns the data it held
+@njit(cache=True)
+def stash_remove(stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta, slot):
+    stash_slot[stash_bids[slot]] = -1
+    stash_bids[slot] = -1
+    stash_used[slot] = 0
+    stash_next[slot] = stash_meta[FREE_HEAD]
+    stash_meta[FREE_HEAD] = slot
+    stash_meta[STASH_COUNT] -= 1
+    return stash_data[slot]
+
+# places blocks order[start:] into the deepest non-full bucket on their path, overflow goes to stash
+# returns how far it got, which is less than len(order) only when the stash arrays ran out of slots
+@njit(cache=True)
+def initial_place_blocks_njit(tree_bids, tree_data, tree_occ, Z, L, path_table, position, order, start,
+                              stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta):
+    for i in range(start, order.size):
+        a = order[i]
+        leaf = position[a]
+        placed = False
+        for l in range(L, -1, -1):
+            flat = path_table[leaf, l]
+            occ = int(tree_occ[flat])
+            if occ < Z:
+                tree_bids[flat * Z + occ] = a
+                tree_data[flat * Z + occ] = a << VERSION_BITS # initial data is block_id with version 0
+                tree_occ[flat] = occ + 1
+                placed = True
+                break
+        if not placed:
+            if stash_meta[FREE_HEAD] == -1:
+                return i
+            stash_insert(stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta, a, a << VERSION_BITS)
+    return order.size
+
+# moves every block stored in bucket 'flat' into the stash
+@njit(cache=True)
+def read_bucket(tree_bids, tree_data, tree_occ, Z, flat,
+                stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta):
+    base = flat * Z
+    for k in range(base, base + int(tree_occ[flat])):
+        stash_insert(stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta,
+                     tree_bids[k], tree_data[k])
+    tree_occ[flat] = 0 # clearing a bucket only resets its occupancy, stale slots get overwritten on refill
+
+# reads the data of block a; every block is always in the tree or the stash, so once the path to
+# position[a] has been read the block is in the stash
+@njit(cache=True)
+def stash_read(a, stash_data, stash_slot):
+    return stash_data[stash_slot[a]]
+
+# replaces the data of block a (in the stash, see stash_read) with new_data and returns the data it held
+@njit(cache=True)
+def stash_write(a, new_data, stash_data, stash_slot):
+    slot_a = stash_slot[a]
+    old_data = stash_data[slot_a]
+    stash_data[slot_a] = new_data
+    return old_data
+
+# sorts the used stash slots by the deepest level at which their block fits on the path to x
+# (shared_level[leaf ^ x] is the deepest level the paths to leaf and x share), deepest first;
+# returns the sorted slots and level_end, where order[:level_end[l]] are the slots that fit at level l
+@njit(cache=True)
+def partition_stash(L, shared_level, position, x, stash_bids, stash_used, stash_meta):
+    n = stash_meta[STASH_COUNT]
+    slots = np.empty(n, dtype=np.int64)
+    deepest = np.empty(n, dtype=np.int64)
+    level_end = np.zeros(L + 2, dtype=np.int64)
+    j = 0
+    for s in range(stash_bids.size):
+        if stash_used[s]:
+            d = shared_level[position[stash_bids[s]] ^ x]
+            slots[j] = s
+            deepest[j] = d
+            level_end[d] += 1
+            j += 1
+    for l in range(L - 1, -1, -1):
+        level_end[l] += level_end[l + 1]
+    # counting sort: the group of level d goes to order[level_end[d + 1]:level_end[d]]
+    fill = level_end[1:].copy()
+    order = np.empty(n, dtype=np.int64)
+    for j in range(n):
+        order[fill[deepest[j]]] = slots[j]
+        fill[deepest[j]] += 1
+    return order, level_end
+
+# appends the slots that fit no deeper than level l (order[level_end[l + 1]:level_end[l]]) to the
+# pending slots order[:npend] (which never reach past level_end[l + 1]); returns the new npend
+@njit(cache=True)
+def add_level(order, level_end, l, npend):
+    for j in range(level_end[l + 1], level_end[l]):
+        order[npend] = order[j]
+        npend += 1
+    return npend
+
+# puts every pending stash slot (order[:npend]) into the level-l bucket on its block's own path while
+# that bucket has room, compacting the ones left over to the front of order; returns how many are left
+@njit(cache=True)
+def refill_level(tree_bids, tree_data, tree_occ, Z, L, l, position, order, npend,
+                 stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta):
+    keep = 0
+    for j in range(npend):
+        s = order[j]
+        flat = (1 << l) - 1 + (position[stash_bids[s]] >> (L - l))
+        occ = int(tree_occ[flat])
+        if occ < Z:
+            tree_bids[flat * Z + occ] = stash_bids[s]
+            tree_data[flat * Z + occ] = stash_remove(stash_bids, stash_data, stash_used, stash_next, stash_slot,
+                                                     stash_meta, s)
+            tree_occ[flat] = occ + 1
+        else:
+            order[keep] = s
+            keep += 1
+    return keep
+
+# moves every block stored on the path to leaf x into the stash
+@njit(cache=True)
+def read_path(tree_bids, tree_data, tree_occ, Z, L, path_table, x,
+              stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta):
+    for l in range(L + 1):
+        read_bucket(tree_bids, tree_data, tree_occ, Z, path_table[x, l],
+                    stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+
+# iterate level by level (deepest first) through the path to leaf x, which read_path has just emptied, and
+# fill its buckets with blocks from stash: the stash is partitioned by the deepest level each block fits at,
+# so level l only looks at blocks that fit there and were not placed further down
+@njit(cache=True)
+def evict_path(tree_bids, tree_data, tree_occ, Z, L, shared_level, position, x,
+               stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta):
+    remaining = (L + 1) * Z # free slots left on the (empty) path
+    order, level_end = partition_stash(L, shared_level, position, x, stash_bids, stash_used, stash_meta)
+    npend = 0
+    for l in range(L, -1, -1):
+        if remaining == 0 or stash_meta[STASH_COUNT] == 0:
+            break # nothing left to place, or nowhere left to place it
+        npend = add_level(order, level_end, l, npend)
+        left = refill_level(tree_bids, tree_data, tree_occ, Z, L, l, position, order, npend,
+                            stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+        remaining -= npend - left
+        npend = left
+
+# read-path eviction read of block a on leaf x; position[a] must already hold the new leaf
+# the stash needs at least (L+1)*Z + 1 free slots on entry
+@njit(cache=True)
+def access_read_njit(tree_bids, tree_data, tree_occ, Z, L, path_table, shared_level, position, a, x,
+                     stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta):
+    read_path(tree_bids, tree_data, tree_occ, Z, L, path_table, x,
+              stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+    old_data = stash_read(a, stash_data, stash_slot)
+    evict_path(tree_bids, tree_data, tree_occ, Z, L, shared_level, position, x,
+               stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+    return old_data
+
+# same as access_read_njit, but writes new_data to block a
+@njit(cache=True)
+def access_write_njit(tree_bids, tree_data, tree_occ, Z, L, path_table, shared_level, position, a, x, new_data,
+                      stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta):
+    read_path(tree_bids, tree_data, tree_occ, Z, L, path_table, x,
+              stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+    old_data = stash_write(a, new_data, stash_data, stash_slot)
+    evict_path(tree_bids, tree_data, tree_occ, Z, L, shared_level, position, x,
+               stash_bids, stash_data, stash_used, stash_next, stash_slot, stash_meta)
+    return old_data
 
 class PathORAM:
     # initialize all required variables and the tree
     def __init__(self, N: int, Z: int, L: int, seed: Optional[int] = None):
         assert N > 0
-        assert Z > 0
+        assert 0 < Z <= np.iinfo(np.uint8).max  # bucket occupancy is kept in a uint8
         assert L >= 1 and (1 << L) >= N
         self.N = N
         self.Z = Z
         self.L = L
         self.num_nodes = (1 << (L + 1)) - 1
-        self.tree = [list() for _ in range(self.num_nodes)]
-        if seed is not None:
-            random.seed(seed)
+        self.path_blocks = (L + 1) * Z  # most blocks a single path can hold
+        # tree is stored as flat 1D arrays: block ids and their data, with the Z slots of bucket 'flat'
+        # at [flat*Z, flat*Z + Z), plus the bucket occupancy
+        # (only the first tree_occ[flat] slots of a bucket are live, the rest is leftover garbage)
+        self.tree_bids = np.full(self.num_nodes * Z, -1, dtype=np.int32)
+        self.tree_data = np.zeros(self.num_nodes * Z, dtype=np.int64)
+        self.tree_occ = np.zeros(self.num_nodes, dtype=np.uint8)
+        self.rng = np.random.default_rng(seed)
         self.leaf_space = 1 << L  # number of leaf nodes (< num_nodes)
-        self.position = [random.randrange(self.leaf_space) for _ in range(N)] # position of each block is also randomized
-        self.stash = {}
+        # path_table[leaf] lists the flat node indices from root to leaf
+        leaves = np.arange(self.leaf_space, dtype=np.int32)[:, None]
+        levels = np.arange(L + 1, dtype=np.int32)[None, :]
+        self.path_table = (1 << levels) - 1 + (leaves >> (L - levels))
+        # shared_level[leaf_a ^ leaf_b] is the deepest level at which the paths to leaf_a and leaf_b
+        # share a bucket, i.e. L minus the bit length of the xor
+        self.shared_level = np.full(self.leaf_space, L, dtype=np.int8)
+        for k in range(1, L + 1):
+            self.shared_level[1 << (k - 1):1 << k] = L - k
+        self.position = self.rng.integers(0, self.leaf_space, size=N, dtype=np.int32) # position of each block is also randomized
+        # stash is stored the same way: slot arrays, a used-bitmap and a free-list threaded through stash_next
+        self.stash_bids = np.empty(0, dtype=np.int32)
+        self.stash_data = np.empty(0, dtype=np.int64)
+        self.stash_used = np.empty(0, dtype=np.uint8)
+        self.stash_next = np.empty(0, dtype=np.int32)
+        self.stash_slot = np.full(N, -1, dtype=np.int32) # stash slot of each block, -1 when it is not in the stash
+        self.stash_meta = np.array([-1, 0], dtype=np.int64)
+        self._grow_stash(2 * self.path_blocks)
         self._initial_place_blocks()
 
-    # returns the bucket stored at level 'level' and index 'idx'
-    def _bucket(self, level: int, idx: int) -> list:
-        return self.tree[node_index(level, idx)]
+    # number of blocks currently held in the stash
+    @property
+    def stash_count(self) -> int:
+        return int(self.stash_meta[STASH_COUNT])
+
+    # enlarges the stash arrays to 'new_cap' slots, chaining the new slots in front of the free-list
+    def _grow_stash(self, new_cap: int):
+        cap = self.stash_bids.size
+        extra = new_cap - cap
+        self.stash_bids = np.concatenate([self.stash_bids, np.full(extra, -1, dtype=np.int32)])
+        self.stash_data = np.concatenate([self.stash_data, np.zeros(extra, dtype=np.int64)])
+        self.stash_used = np.concatenate([self.stash_used, np.zeros(extra, dtype=np.uint8)])
+        new_next = np.arange(cap + 1, new_cap + 1, dtype=np.int32)
+        new_next[-1] = self.stash_meta[FREE_HEAD]
+        self.stash_next = np.concatenate([self.stash_next, new_next])
+        self.stash_meta[FREE_HEAD] = cap
 
     # initialization of blocks into random buckets but still adhering to position table
     def _initial_place_blocks(self):
-        order = list(range(self.N))
-        random.shuffle(order) # to sample blocks randomly to be placed (this is randomization on top of position randomization)
-        for a in order:
-            leaf = self.position[a]
-            placed = False
-            for l in range(self.L, -1, -1):
-                idx = leaf >> (self.L - l) if l > 0 else 0 # this does the bitshift to move up from child node to parent node index
-                bucket = self._bucket(l, idx)
-                if len(bucket) < self.Z:
-                    bucket.append((a, a)) # here (a,a) corresponds to (block_ID, data) initial data is kept the same as block_id cuz we don't care about the data
-                    placed = True
-                    break
-            if not placed:
-                self.stash[a] = a
-
-    # perform operation 'op' on block with block_id 'a'
-    def access(self, op: str, a: int, new_data=None):
+        order = self.rng.permutation(self.N) # to sample blocks randomly to be placed (this is randomization on top of position randomization)
+        done = 0
+        while done < self.N:
+            if done > 0:
+                self._grow_stash(2 * self.stash_bids.size)
+            done = initial_place_blocks_njit(self.tree_bids, self.tree_data, self.tree_occ, self.Z, self.L,
+                                             self.path_table, self.position, order, done, self.stash_bids,
+                                             self.stash_data, self.stash_used, self.stash_next, self.stash_slot,
+                                             self.stash_meta)
+
+    # debug check that every block is stored exactly once (in the tree or the stash) and that each block
+    # written by simulate (write_counts[id] > 0) carries its own id and write_counts[id] as the version
+    def _check_payloads(self, write_counts: np.ndarray):
+        live = (np.arange(self.Z) < self.tree_occ[:, None]).ravel()
+        in_stash = self.stash_used != 0
+        bids = np.concatenate([self.tree_bids[live], self.stash_bids[in_stash]])
+        data = np.concatenate([self.tree_data[live], self.stash_data[in_stash]])
+        if not np.array_equal(np.sort(bids), np.arange(self.N)):
+            raise RuntimeError("blocks lost or duplicated")
+        written = write_counts[bids] > 0
+        block_ids, versions = unpack_data(data[written])
+        if not np.array_equal(block_ids, bids[written]):
+            raise RuntimeError("block data stored under the wrong block")
+        if not np.array_equal(versions, write_counts[bids[written]]):
+            raise RuntimeError("block data has a stale version")
+
+    # perform operation 'op' on block with block_id 'a', remapping it to 'new_leaf' (drawn here if not given)
+    def access(self, op: str, a: int, new_data: Optional[int] = None, new_leaf: Optional[int] = None) -> int:
         assert 0 <= a < self.N
         assert op in ("read", "write")
-        x = self.position[a]
-        self.position[a] = random.randrange(self.leaf_space)
-
-        # load all bucket blocks into stash
-        for (l, idx) in path_nodes(self.L, x):
-            bucket = self._bucket(l, idx)
-            for (bid, bdata) in bucket:
-                self.stash[bid] = bdata
-            bucket.clear()
+        if new_leaf is None: # leaf_space is a power of two, so masking raw bits is an unbiased draw
+            new_leaf = int(self.rng.bit_generator.random_raw()) & (self.leaf_space - 1)
+        assert 0 <= new_leaf < self.leaf_space
+        if op == "write":
+            if new_data is None:
+                raise ValueError("a write needs new_data")
+            return self._write(a, new_data, new_leaf)
+        return self._read(a, new_leaf)
 
-        old_data = (a, None)   # always return a tuple
+    # read block a through the read-only kernel and remap it to new_leaf
+    def _read(self, a: int, new_leaf: int) -> int:
+        if self.stash_bids.size - self.stash_count <= self.path_blocks:
+            self._grow_stash(2 * self.stash_bids.size)
+        x = int(self.position[a])
+        self.position[a] = new_leaf
+        if path_oram_core is not None:
+            return path_oram_core.access_read(self.tree_bids, self.tree_data, self.tree_occ, self.Z, self.L,
+                                              self.path_table, self.shared_level, self.position, a, x,
+                                              self.stash_bids, self.stash_data, self.stash_used, self.stash_next,
+                                              self.stash_slot, self.stash_meta)
+        return access_read_njit(self.tree_bids, self.tree_data, self.tree_occ, self.Z, self.L, self.path_table,
+                                self.shared_level, self.position, a, x, self.stash_bids, self.stash_data,
+                                self.stash_used, self.stash_next, self.stash_slot, self.stash_meta)
 
-        if a in self.stash:
-            old_data = self.stash[a]
+    # write new_data to block a through the write kernel and remap it to new_leaf
+    def _write(self, a: int, new_data: int, new_leaf: int) -> int:
+        if self.stash_bids.size - self.stash_count <= self.path_blocks:
+            self._grow_stash(2 * self.stash_bids.size)
+        x = int(self.position[a])
+        self.position[a] = new_leaf
+        if path_oram_core is not None:
+            return path_oram_core.access_write(self.tree_bids, self.tree_data, self.tree_occ, self.Z, self.L,
+                                               self.path_table, self.shared_level, self.position, a, x, new_data,
+                                               self.stash_bids, self.stash_data, self.stash_used, self.stash_next,
+                                               self.stash_slot, self.stash_meta)
+        return access_write_njit(self.tree_bids, self.tree_data, self.tree_occ, self.Z, self.L, self.path_table,
+                                 self.shared_level, self.position, a, x, new_data, self.stash_bids, self.stash_data,
+                                 self.stash_used, self.stash_next, self.stash_slot, self.stash_meta)
 
-        if op == "write":
-            self.stash[a] = new_data
-
-        # iterate through all nodes along the last extracted path 
-        # and fill the buckets on each level with blocks from stash 
-        # if that block's path and last extractedf path intersect 
-        # at that level
-        for l in range(self.L, -1, -1):    
-            idx = x >> (self.L - l) if l > 0 else 0
-            bucket = self._bucket(l, idx)
-            if len(bucket) >= self.Z:
-                continue
-            capacity = self.Z - len(bucket)
-            chosen = []
-            for bid in list(self.stash.keys()):
-                if same_subtree_at_level(self.L, self.position[bid], x, l):
-                    chosen.append(bid)
-                    if len(chosen) == capacity:
-                        break
-            for bid in chosen:
-                bucket.append((bid, self.stash.pop(bid)))
-        return old_data
-
-    def simulate(self, total_ops: int, warmup_ops: int, record_file: Optional[str] = None):
+    # access t is on block t mod N, a write stores the block's version (its number of writes so far) and
+    # 'check' verifies those payloads at the end (see _check_payloads)
+    def simulate(self, total_ops: int, warmup_ops: int, record_file: Optional[str] = None, check: bool = False):
         assert total_ops > warmup_ops >= 0
-        versions = [0] * self.N
-        recorded_stash_sizes = []
-        block = 0
+        recorded_stash_sizes = np.empty(total_ops - warmup_ops, dtype=np.int32)
+        # draw all remap targets and read/write coin flips up front in two batched calls
+        new_leaves = self.rng.integers(0, self.leaf_space, size=total_ops, dtype=np.int32)
+        op_bits = self.rng.integers(0, 2, size=total_ops, dtype=np.uint8)
 
-        for t in range(total_ops):
-            op = "write" if random.getrandbits(1) else "read"
-            a = block
-            block += 1
-            if block == self.N:
-                block = 0
+        versions = np.zeros(self.N, dtype=np.int64)
 
-            if op == "write":
+        next_report = 100000
+        for t in range(total_ops):
+            a = t % self.N
+            if op_bits[t]:
                 versions[a] += 1
-                self.access("write", a, (a, versions[a]))
+                self._write(a, (a << VERSION_BITS) | int(versions[a]), int(new_leaves[t]))
             else:
-                _ = self.access("read", a, None)
+                self._read(a, int(new_leaves[t]))
 
             if t >= warmup_ops:
-                recorded_stash_sizes.append(len(self.stash))
-            if t!=0 and t%100000 == 0:
-                print(f"[INFO] {t} accesses performed so far..") # to show progress
+                recorded_stash_sizes[t - warmup_ops] = self.stash_count
+            if t + 1 > next_report:
+                print(f"[INFO] {next_report} accesses performed so far..") # to show progress
+                next_report += 100000
+
+        if check:
+            self._check_payloads(versions)
 
-        max_stash = max(recorded_stash_sizes) if recorded_stash_sizes else 0
-        tail_counts = {}
         s = len(recorded_stash_sizes)
-        hist = [0] * (max_stash + 1)   # create a histogram(frequency chart) for different stash sizes
-        for val in recorded_stash_sizes:
-            hist[val] += 1
-        suffix_ge = [0] * (max_stash + 2)
-        running = 0
-
-        # count values from right to left so that you can add suffix_ge to the tail_counts
-        for k in range(max_stash, -1, -1):
-            running += hist[k]
-            suffix_ge[k] = running
-        for i in range(0, max_stash + 1):
-            tail_counts[i] = suffix_ge[i + 1] if (i + 1) <= max_stash else 0
+        hist = np.bincount(recorded_stash_sizes)   # create a histogram(frequency chart) for different stash sizes
+        max_stash = hist.size - 1
+
+        # tail_counts[i] counts recorded sizes > i: suffix_ge[k] counts sizes >= k, shifted left by one
+        suffix_ge = np.cumsum(hist[::-1])[::-1]
+        tail_counts = np.empty(max_stash + 1, dtype=np.int64)
+        tail_counts[:-1] = suffix_ge[1:]
+        tail_counts[-1] = 0
 
         if record_file is not None:
-            with open(record_file, "w", encoding="utf-8") as f:
-                f.write(f"-1,{s}\n")
-                for i in range(0, max_stash + 1):
-                    f.write(f"{i},{tail_counts[i]}\n")
+            write_record_file(record_file, tail_counts, s)
+
+        return tail_counts, max_stash, s
+
+# writes the "-1,S" header and then one "i,tail_counts[i]" row per stash size
+def write_record_file(record_file: str, tail_counts: np.ndarray, s: int):
+    with open(record_file, "w", encoding="utf-8") as f:
+        f.write(f"-1,{s}\n")
+        rows = np.column_stack([np.arange(tail_counts.size), tail_counts])
+        np.savetxt(f, rows, fmt="%d,%d") # one write for all rows
 
-        return tail_counts, max_stash, len(recorded_stash_sizes)
+# one independent simulation run, at module level so worker processes can pickle it
+def run_simulation(N: int, Z: int, L: int, seed: Optional[int], total_ops: int, warmup_ops: int, check: bool):
+    return PathORAM(N=N, Z=Z, L=L, seed=seed).simulate(total_ops=total_ops, warmup_ops=warmup_ops, check=check)
 
 def main():
     ap = argparse.ArgumentParser(description="Path ORAM simulator")
@@ -171,16 +411,39 @@ def main():
     ap.add_argument("--warmup", type=int, required=True)
     ap.add_argument("--seed", type=int, default=None)
     ap.add_argument("--out", type=str, default=None)
+    ap.add_argument("--seeds", type=int, default=1,
+                    help="number of independent runs (seeds seed, seed+1, ...) done in parallel and added together")
+    ap.add_argument("--check", action="store_true",
+                    help="after simulating, verify every block's stored id and version (debugging aid)")
     args = ap.parse_args()
+    if args.seeds < 1:
+        ap.error("--seeds must be at least 1")
 
     if args.L < math.ceil(math.log2(args.N)):
         print(f"[WARN] L={args.L} is less than ceil(log2(N))={math.ceil(math.log2(args.N))}.", file=sys.stderr)
         sys.exit(2)
 
-    print(f"[INFO] Initializing Path ORAM: N={args.N}, Z={args.Z}, L={args.L}, seed={args.seed}")
-    poram = PathORAM(N=args.N, Z=args.Z, L=args.L, seed=args.seed)
-    print(f"[INFO] Simulating: total_ops={args.ops}, warmup={args.warmup}")
-    tail_counts, max_stash, recorded = poram.simulate(total_ops=args.ops, warmup_ops=args.warmup, record_file=args.out)
+    if args.seeds > 1:
+        seeds = [None if args.seed is None else args.seed + i for i in range(args.seeds)]
+        print(f"[INFO] Simulating {args.seeds} runs in parallel: N={args.N}, Z={args.Z}, L={args.L}, seeds={seeds}, "
+              f"total_ops={args.ops}, warmup={args.warmup}")
+        with ProcessPoolExecutor(max_workers=min(args.seeds, os.cpu_count() or 1)) as pool:
+            runs = list(pool.map(partial(run_simulation, args.N, args.Z, args.L, total_ops=args.ops,
+                                         warmup_ops=args.warmup, check=args.check), seeds))
+        # tail counts of independent runs add up, the shorter ones are zero past their own max stash
+        max_stash = max(run[1] for run in runs)
+        tail_counts = np.zeros(max_stash + 1, dtype=np.int64)
+        for run_tail_counts, _, _ in runs:
+            tail_counts[:run_tail_counts.size] += run_tail_counts
+        recorded = sum(run[2] for run in runs)
+        if args.out:
+            write_record_file(args.out, tail_counts, recorded)
+    else:
+        print(f"[INFO] Initializing Path ORAM: N={args.N}, Z={args.Z}, L={args.L}, seed={args.seed}")
+        poram = PathORAM(N=args.N, Z=args.Z, L=args.L, seed=args.seed)
+        print(f"[INFO] Simulating: total_ops={args.ops}, warmup={args.warmup}")
+        tail_counts, max_stash, recorded = poram.simulate(total_ops=args.ops, warmup_ops=args.warmup,
+                                                          record_file=args.out, check=args.check)
     print(f"[INFO] Recorded accesses: {recorded}")
     print(f"[INFO] Max stash observed: {max_stash}")
     if args.out:
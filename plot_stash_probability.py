@@ -5,32 +5,25 @@ Generates P[size(S) > R] vs R for Z=2 and Z=4 using simulation output files.
 """
 
 import matplotlib.pyplot as plt
+import numpy as np
 
 def read_simulation_file(path):
-    """Read the simulationX.txt file and return (S, tail_counts dict)."""
-    tail_counts = {}
-    total_accesses = None
-    with open(path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            parts = line.split(',')
-            if parts[0].startswith('-1'):
-                total_accesses = int(parts[1])
-            else:
-                i = int(parts[0])
-                s_i = int(parts[1])
-                tail_counts[i] = s_i
-    if total_accesses is None:
+    """Read the simulationX.txt file and return (S, tail_counts array indexed by R)."""
+    rows = np.loadtxt(path, delimiter=',', dtype=np.int64, ndmin=2)
+    header = rows[:, 0] == -1
+    if not header.any():
         raise ValueError(f"No total line (-1, S) found in {path}")
+    total_accesses = int(rows[header, 1][0])
+    body = rows[~header]
+    tail_counts = np.zeros(body[:, 0].max() + 1 if body.size else 0, dtype=np.int64)
+    tail_counts[body[:, 0]] = body[:, 1]
     return total_accesses, tail_counts
 
 
 def compute_probabilities(total_accesses, tail_counts):
-    """Return lists of (R, P[size(S)>R]) excluding R=0."""
-    R_vals = sorted(k for k in tail_counts.keys() if k > 0)
-    probs = [tail_counts[r] / total_accesses for r in R_vals]
+    """Return arrays of (R, P[size(S)>R]) excluding R=0."""
+    R_vals = np.arange(1, tail_counts.size)
+    probs = tail_counts[1:] / total_accesses
     return R_vals, probs
 
 